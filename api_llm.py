@@ -4,10 +4,370 @@ API-based LLM Integration for Graph-RAG
 Clean, fast, and reliable using external APIs
 """
 import os
+import re
+import time
+import random
+import hashlib
+import bisect
+import asyncio
+import threading
+import aiohttp
 import requests
-from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from contextlib import asynccontextmanager
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+def _dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Serialize a request body to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(obj, sort_keys=sort_keys, default=str).encode("utf-8")
+
+def _loads(data):
+    """Parse a JSON response body (bytes or str)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+try:
+    import tiktoken
+except ImportError:  # without tiktoken, token counts are approximated from length
+    tiktoken = None
+
+# Token budget for retrieved context: the smallest default model window
+# minus room for the system prompt and the answer
+_MAX_PROMPT_TOKENS = 4096
+_RESERVED_TOKENS = 1024
+_CHARS_PER_TOKEN = 4
+
+_encoding = None
+
+def _get_encoding():
+    """Load the tokenizer once; False when unavailable"""
+    global _encoding
+    if _encoding is None:
+        try:
+            # cl100k_base is close enough for budgeting non-OpenAI models too
+            _encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else False
+        except Exception:
+            _encoding = False
+    return _encoding
+
+@lru_cache(maxsize=1024)
+def _truncate_tokens(text: str, budget: int) -> str:
+    """Trim text to at most budget tokens; cached because docs repeat across queries"""
+    encoding = _get_encoding()
+    if not encoding:
+        limit = budget * _CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit] + "…"
+    
+    ids = encoding.encode(text)
+    if len(ids) <= budget:
+        return text
+    return encoding.decode(ids[:budget]) + "…"
+
+# Supported providers in priority order:
+# (api_type, env var, base URL, default model, display name)
+_PROVIDERS = (
+    ("openai", "OPENAI_API_KEY", "https://api.openai.com/v1", "gpt-3.5-turbo", "OpenAI"),
+    ("groq", "GROQ_API_KEY", "https://api.groq.com/openai/v1", "llama3-8b-8192", "Groq"),  # Free tier available
+    ("ollama", "OLLAMA_BASE_URL", None, "llama2", "Ollama"),  # Local API server
+)
+
+# Static instructions live in the system message so every request shares the
+# same prefix bytes and providers with automatic prefix caching can reuse it.
+_SYSTEM_PROMPT = """You are a helpful assistant that answers questions about superheroes based on the provided context. Always use the specific information from the context in your response.
+
+Answer the question based on the provided context. Use specific details from the context in your response.
+
+INSTRUCTIONS:
+- Answer based on the context provided
+- Include specific details like names, powers, relationships when available
+- Be concise but informative
+- If the context doesn't contain the answer, say so clearly"""
+
+# Fixed spine of the per-request prompt; instructions live in _SYSTEM_PROMPT
+_PROMPT_HEAD = "CONTEXT INFORMATION:\n"
+_PROMPT_MID = "\n\nQUESTION: "
+
+# Mock responses: one regex pass over the query picks the topic, one pass over
+# each document harvests the facts the handlers need.
+_QUERY_RE = re.compile(r"superman|clark|batman|bruce|wonder woman|diana|flash|barry|justice league|team|group|power|ability|strength|name")
+_QUERY_TOPICS = {
+    "superman": "superman", "clark": "superman",
+    "batman": "batman", "bruce": "batman",
+    "wonder woman": "wonder_woman", "diana": "wonder_woman",
+    "flash": "flash", "barry": "flash",
+    "team": "team", "justice league": "team", "group": "team",
+    "power": "power", "ability": "power", "strength": "power",
+}
+_TOPIC_PRIORITY = ("superman", "batman", "wonder_woman", "flash", "team", "power")
+
+_FACT_RE = re.compile(r"Superman|Clark Kent|Batman|Bruce Wayne|Wonder Woman|Diana Prince|Flash|Barry Allen|Krypton|super strength|flight|Justice League")
+_REAL_NAMES = (
+    ("Superman", "Clark Kent", "superman_real_name"),
+    ("Batman", "Bruce Wayne", "batman_real_name"),
+    ("Wonder Woman", "Diana Prince", "wonder_woman_real_name"),
+    ("Flash", "Barry Allen", "flash_real_name"),
+)
+_SUPERMAN_DETAILS = (
+    ("Krypton", "from the planet Krypton"),
+    ("super strength", "has super strength"),
+    ("flight", "can fly"),
+    ("Justice League", "is a member of the Justice League"),
+)
+
+def _mock_superman(hero_info, facts, all_context, asks_name, rag_type):
+    if asks_name:
+        if 'superman_real_name' in hero_info:
+            return f"Superman's real name is {hero_info['superman_real_name']}. This information comes from the retrieved documents."
+        elif 'Clark Kent' in facts:
+            return "Superman's real name is Clark Kent, as mentioned in the knowledge base."
+    
+    # Find Superman-specific info from context
+    superman_details = [detail for fact, detail in _SUPERMAN_DETAILS if fact in facts]
+    if superman_details:
+        return f"Based on the retrieved context: Superman {', '.join(superman_details)}."
+    return f"Superman information found in context: {all_context[:200]}..."
+
+def _mock_batman(hero_info, facts, all_context, asks_name, rag_type):
+    if asks_name:
+        if 'batman_real_name' in hero_info:
+            return f"Batman's real name is {hero_info['batman_real_name']}."
+        elif 'Bruce Wayne' in facts:
+            return "Batman's real name is Bruce Wayne."
+    return f"Batman information from context: {all_context[:200]}..."
+
+def _mock_wonder_woman(hero_info, facts, all_context, asks_name, rag_type):
+    if asks_name:
+        if 'wonder_woman_real_name' in hero_info:
+            return f"Wonder Woman's real name is {hero_info['wonder_woman_real_name']}."
+        elif 'Diana Prince' in facts:
+            return "Wonder Woman's real name is Diana Prince."
+    return f"Wonder Woman information from context: {all_context[:200]}..."
+
+def _mock_flash(hero_info, facts, all_context, asks_name, rag_type):
+    if asks_name:
+        if 'flash_real_name' in hero_info:
+            return f"The Flash's real name is {hero_info['flash_real_name']}."
+        elif 'Barry Allen' in facts:
+            return "The Flash's real name is Barry Allen."
+    return f"Flash information from context: {all_context[:200]}..."
+
+def _mock_team(hero_info, facts, all_context, asks_name, rag_type):
+    return f"The Justice League is a team of superheroes including Superman, Batman, Wonder Woman, and The Flash. They work together to protect Earth from major threats. The {rag_type} RAG system found connections between these heroes."
+
+def _mock_power(hero_info, facts, all_context, asks_name, rag_type):
+    return f"Based on the {rag_type} search, the heroes have various powers: Superman has super strength and flight, Batman relies on technology and intellect, Wonder Woman has combat skills and magical items, and Flash has super-speed."
+
+_MOCK_HANDLERS = {
+    "superman": _mock_superman,
+    "batman": _mock_batman,
+    "wonder_woman": _mock_wonder_woman,
+    "flash": _mock_flash,
+    "team": _mock_team,
+    "power": _mock_power,
+}
+
+def _dedupe_docs(docs: List[Dict[str, Any]], limit: int = 5) -> List[Dict[str, Any]]:
+    """First `limit` distinct docs by content hash, preserving retrieval order"""
+    seen = set()
+    unique = []
+    for doc in docs:
+        digest = hashlib.blake2b(_dumps(doc, sort_keys=True), digest_size=8).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        unique.append(doc)
+        if len(unique) >= limit:
+            break
+    return unique
+
+# Context formatters for graph docs, dispatched on the doc "type" field or, for the rows
+# SuperheroGraph returns (which carry no "type"), on their shape
+def _format_hero(doc: Dict[str, Any]) -> str:
+    real_name = doc.get("real_name", "")
+    powers = doc.get("powers", [])
+    origin = doc.get("origin", "")
+    team = doc.get("team", "")
+    return "".join((
+        doc.get("name") or doc.get("hero") or "Unknown Hero",  # team_members rows use "hero"
+        f" (real name: {real_name})" if real_name else "",
+        f" has powers: {', '.join(powers)}" if powers else "",
+        f", from {origin}" if origin else "",
+        f", member of {team}" if team else "",
+    ))
+
+def _format_relationship(doc: Dict[str, Any]) -> str:
+    if "connected_to" in doc:
+        # hero_relationships row: {hero, relationship, connected_to, connected_type}
+        return f"{doc.get('hero', '')} {doc.get('relationship', '')} {doc['connected_to']}"
+    return f"{doc.get('hero1', '')} and {doc.get('hero2', '')} are {doc.get('relationship', '')}"
+
+def _format_teammate(doc: Dict[str, Any]) -> str:
+    real_name = doc.get("real_name", "")
+    team = doc.get("team", "")
+    return "".join((
+        doc.get("teammate", ""),
+        f" (real name: {real_name})" if real_name else "",
+        " is a teammate",
+        f" in {team}" if team else "",
+    ))
+
+def _format_generic(doc: Dict[str, Any]) -> str:
+    # Fallback - use the content, or build it from the available fields
+    return doc.get("content", "") or ", ".join(
+        f"{key}: {', '.join(map(str, value)) if isinstance(value, list) else value}"
+        for key, value in doc.items()
+        if key not in ["type", "content"] and value
+    )
+
+_FORMATTERS = {
+    "hero": _format_hero,
+    "relationship": _format_relationship,
+    "teammate": _format_teammate,
+}
+
+def _graph_doc_type(doc: Dict[str, Any]) -> str:
+    """The doc's "type", or the kind of graph row it is shaped like"""
+    if "type" in doc:
+        return doc["type"]
+    if "relationship" in doc:
+        return "relationship"
+    if "teammate" in doc:
+        return "teammate"
+    if "name" in doc or "powers" in doc:
+        return "hero"
+    return "unknown"
+
+def _format_graph_doc(doc: Dict[str, Any]) -> str:
+    doc_type = _graph_doc_type(doc)
+    return f"[{doc_type.upper()}] {_FORMATTERS.get(doc_type, _format_generic)(doc)}"
+
+def _format_traditional(doc: Dict[str, Any], i: int) -> str:
+    title = doc.get('title', f'Document {i+1}')
+    # Fallback to the whole doc when there is no content field
+    content = doc.get('content', '') or str(doc)
+    return f"[{title}] (relevance: {doc.get('similarity', 0):.2f}) {content}"
+
+class RetryableError(Exception):
+    """Transient provider failure (throttling, 5xx, timeout) - try the next provider"""
+
+# Only advertise encodings urllib3 can decode here (gzip/deflate, plus br and
+# zstd when brotli / zstandard are installed)
+_ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Generation defaults: short factual lookups get a tight output budget, and
+# stop sequences cut off the model echoing the prompt structure back
+_DEFAULT_TEMPERATURE = 0.3
+_SHORT_ANSWER_CUES = ("name", "who is", "is the real")
+_SHORT_MAX_TOKENS = 64
+_DEFAULT_MAX_TOKENS = 256
+_STOP_SEQUENCES = ["\n\nQUESTION:", "\n\nCONTEXT"]
+
+def _generation_options(query: str, max_tokens: Optional[int], temperature: float) -> Dict[str, Any]:
+    """Per-request sampling settings, picking a max_tokens default from the query"""
+    if max_tokens is None:
+        query_lower = query.lower()
+        max_tokens = _SHORT_MAX_TOKENS if any(k in query_lower for k in _SHORT_ANSWER_CUES) else _DEFAULT_MAX_TOKENS
+    return {"max_tokens": max_tokens, "temperature": temperature, "stop": _STOP_SEQUENCES}
+
+# HTTP statuses worth failing over on
+_RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+# Statuses retried against the same provider with exponential backoff
+_BACKOFF_STATUS = (429, 500, 502, 503, 504)
+_MAX_ATTEMPTS = 5
+_BACKOFF_FACTOR = 0.5
+_MAX_BACKOFF = 32.0
+
+def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+    """Seconds to wait before the next attempt, preferring the server's Retry-After"""
+    if retry_after:
+        try:
+            return min(_MAX_BACKOFF, max(0.0, float(retry_after)))
+        except ValueError:
+            pass  # HTTP-date form - fall back to computed backoff
+    return min(_MAX_BACKOFF, _BACKOFF_FACTOR * 2 ** attempt) + random.random() * 0.3
+
+class _CappedRetry(Retry):
+    """urllib3 Retry that never sleeps longer than _MAX_BACKOFF for a Retry-After header"""
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, _MAX_BACKOFF)
+
+# Circuit breaker: skip a provider for a while after repeated failures
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 30.0
+
+class _Provider:
+    """Request settings and circuit-breaker state for one configured API"""
+    
+    def __init__(self, api_type: str, api_key: Optional[str], base_url: str, model: str, label: str):
+        self.api_type = api_type
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.label = label
+        
+        # Static request scaffolding, built once and merged per call
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.chat_url = f"{base_url}/chat/completions"
+        self.generate_url = f"{base_url}/api/generate"
+        self.base_payload = {"model": model}
+        self.ollama_base_payload = {
+            "model": model,
+            "system": _SYSTEM_PROMPT,
+            "stream": False
+        }
+        
+        self.failures = 0
+        self.skip_until = 0.0
+    
+    def available(self, now: float) -> bool:
+        return now >= self.skip_until
+    
+    def record_success(self):
+        self.failures = 0
+        self.skip_until = 0.0
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= _BREAKER_THRESHOLD:
+            self.skip_until = time.monotonic() + _BREAKER_COOLDOWN
+
+def _openai_error(status: int, text: str) -> Exception:
+    """Build the exception for a failed OpenAI-compatible call"""
+    error_msg = f"API Error {status}"
+    try:
+        error_detail = _loads(text).get("error", {}).get("message", text)
+        error_msg += f": {error_detail}"
+    except:
+        error_msg += f": {text}"
+    return RetryableError(error_msg) if status in _RETRYABLE_STATUS else Exception(error_msg)
+
+def _ollama_error(status: int, text: str) -> Exception:
+    """Build the exception for a failed Ollama call"""
+    error_msg = f"Ollama Error {status}: {text}"
+    return RetryableError(error_msg) if status in _RETRYABLE_STATUS else Exception(error_msg)
+
+def _api_error_message(error: Exception) -> str:
+    return f"❌ API Error: {str(error)}\n\nPlease check your API key and internet connection."
+
+# Network-level failures that trigger failover to the next provider
+_SYNC_FAILOVER_ERRORS = (requests.Timeout, requests.ConnectionError, RetryableError)
+_ASYNC_FAILOVER_ERRORS = (asyncio.TimeoutError, aiohttp.ClientError, RetryableError)
+
 class APILLM:
     """Professional API-based LLM integration - OpenAI compatible"""
     
@@ -19,63 +379,226 @@ class APILLM:
         self.base_url = None
         self.model = None
         
+        # Every configured provider in priority order; the first is the primary
+        self._providers: List[_Provider] = []
+        
         # Try to find available API
         self._detect_api()
+        
+        # Headers and system message shared by every provider
+        self._static_headers = {"Content-Type": "application/json"}
+        self._static_system_msg = {"role": "system", "content": _SYSTEM_PROMPT}
+        
+        # One keep-alive session per client so repeated calls reuse the TLS connection
+        self._session = self._create_session()
+        
+        # Open the primary connection in the background so the first query skips DNS/TLS setup
+        if self.loaded:
+            threading.Thread(target=self._warm, daemon=True).start()
+        
+        # Async session is created lazily inside the running event loop. It lives while async
+        # calls are in flight (_aio_users) or while `async with llm:` holds it (_aio_held)
+        self._aio_session = None
+        self._aio_loop = None
+        self._aio_warm = None
+        self._aio_users = 0
+        self._aio_held = False
+        
+        # LRU cache of answers keyed on (provider, model, rag_type, docs, query)
+        self._resp_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._cache_ttl = 600
+        self._cache_max = 512
+    
+    def _create_session(self) -> requests.Session:
+        """Create a pooled HTTP session with retries on transient errors"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=_CappedRetry(
+                total=_MAX_ATTEMPTS,
+                # Only throttling/5xx responses are retried here; connect and read timeouts
+                # go straight to provider failover instead of blocking for several timeouts
+                connect=0,
+                read=0,
+                backoff_factor=_BACKOFF_FACTOR,
+                status_forcelist=_BACKOFF_STATUS,
+                respect_retry_after_header=True,
+                allowed_methods=frozenset(["POST"]),
+                raise_on_status=False  # hand the last response back for error reporting
+            )
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        
+        session.headers.update(self._static_headers)
+        # aiohttp negotiates its own encodings, so this is set on the requests session only
+        session.headers["Accept-Encoding"] = _ACCEPT_ENCODING
+        return session
+    
+    def _warm(self):
+        """Best-effort HEAD to the primary provider to populate the connection pool"""
+        try:
+            self._session.head(self.base_url, timeout=5)
+        except Exception:
+            pass
+    
+    async def _awarm(self, session: aiohttp.ClientSession):
+        """Async counterpart of _warm for the aiohttp pool"""
+        try:
+            async with session.head(self.base_url, timeout=aiohttp.ClientTimeout(total=5)):
+                pass
+        except Exception:
+            pass
+    
+    def close(self):
+        """Release pooled HTTP connections"""
+        self._session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    async def _ensure_aio(self) -> aiohttp.ClientSession:
+        """Create the aiohttp session for the current event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._aio_session is None or self._aio_session.closed or self._aio_loop is not loop:
+            if self._aio_session is not None and not self._aio_session.closed:
+                # Left over from another (usually finished) loop: close it rather than leak it
+                await self._aio_session.close()
+            self._aio_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers=self._static_headers
+            )
+            self._aio_loop = loop
+            if self.loaded:
+                # Keep a reference so the warm-up task is not garbage collected mid-flight
+                self._aio_warm = loop.create_task(self._awarm(self._aio_session))
+        return self._aio_session
+    
+    @asynccontextmanager
+    async def _aio_scope(self):
+        """Span of one async call: the session is closed on this loop when the last call ends,
+        unless `async with llm:` keeps it for reuse"""
+        self._aio_users += 1
+        try:
+            yield
+        finally:
+            self._aio_users -= 1
+            if not self._aio_users and not self._aio_held:
+                await self._aclose_aio()
+    
+    async def _aclose_aio(self):
+        """Close the async session (on the loop that is running it)"""
+        if self._aio_session is not None and not self._aio_session.closed:
+            await self._aio_session.close()
+        self._aio_session = None
+        self._aio_loop = None
+    
+    async def aclose(self):
+        """Release pooled HTTP connections, including the async session"""
+        await self._aclose_aio()
+        self.close()
+    
+    async def __aenter__(self):
+        self._aio_held = True
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._aio_held = False
+        await self.aclose()
     
     def _detect_api(self):
-        """Detect which API is available from environment"""
-        
-        # Check OpenAI API
-        if os.getenv("OPENAI_API_KEY"):
-            self.api_type = "openai"
-            self.api_key = os.getenv("OPENAI_API_KEY")
-            self.base_url = "https://api.openai.com/v1"
-            self.model = "gpt-3.5-turbo"
-            print("✅ OpenAI API configured")
-            self.loaded = True
-            
-        # Check Groq API (Free tier available)
-        elif os.getenv("GROQ_API_KEY"):
-            self.api_type = "groq"
-            self.api_key = os.getenv("GROQ_API_KEY")
-            self.base_url = "https://api.groq.com/openai/v1"
-            self.model = "llama3-8b-8192"  # Fast Groq model
-            print("✅ Groq API configured")
+        """Detect which APIs are available from environment"""
+        env = os.environ
+        for api_type, env_var, base_url, model, label in _PROVIDERS:
+            value = env.get(env_var)
+            if value:
+                # Ollama is configured by its URL; the others by an API key
+                self._providers.append(_Provider(
+                    api_type,
+                    None if api_type == "ollama" else value,
+                    value if api_type == "ollama" else base_url,
+                    model,
+                    label
+                ))
+                print(f"✅ {label} API configured" + (" (fallback)" if len(self._providers) > 1 else ""))
+        
+        if self._providers:
+            primary = self._providers[0]
+            self.api_type = primary.api_type
+            self.api_key = primary.api_key
+            self.base_url = primary.base_url
+            self.model = primary.model
             self.loaded = True
-            
-        # Check Ollama (Local API server)
-        elif os.getenv("OLLAMA_BASE_URL"):
-            self.api_type = "ollama"
-            self.base_url = os.getenv("OLLAMA_BASE_URL")
-            self.model = "llama2"  # Default Ollama model
-            print("✅ Ollama API configured")
-            self.loaded = True
-            
-        else:
-            self.loaded = False
-            print("❌ No API configured")
-            print("Please set one of:")
-            print("  - OPENAI_API_KEY (OpenAI API)")
-            print("  - GROQ_API_KEY (Groq - has free tier)")
-            print("  - OLLAMA_BASE_URL (Local Ollama server)")
+            return
+        
+        self.loaded = False
+        print("❌ No API configured")
+        print("Please set one of:")
+        print("  - OPENAI_API_KEY (OpenAI API)")
+        print("  - GROQ_API_KEY (Groq - has free tier)")
+        print("  - OLLAMA_BASE_URL (Local Ollama server)")
+        print("Using mock responses until then")
     
     def load_model(self):
         """API doesn't need model loading - just verify configuration"""
         return self.loaded
     
-    def generate_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str = "traditional") -> str:
-        """Generate response using API LLM"""
+    def _cache_key(self, docs: List[Dict[str, Any]], query: str, rag_type: str, options: Dict[str, Any]) -> str:
+        """Stable hash of everything that determines an answer"""
+        doc_ids = [
+            d.get("id") or d.get("title") or d.get("name") or json.dumps(d, sort_keys=True, default=str)
+            for d in docs[:5]
+        ]
+        raw = "|".join([
+            json.dumps(doc_ids, sort_keys=True), query, rag_type, str(self.api_type), str(self.model),
+            str(options["max_tokens"]), str(options["temperature"])
+        ])
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return a cached answer if present and not expired"""
+        entry = self._resp_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.monotonic() - stored_at > self._cache_ttl:
+            del self._resp_cache[key]
+            return None
+        self._resp_cache.move_to_end(key)
+        return answer
+    
+    def _cache_put(self, key: str, answer: str):
+        """Store an answer, evicting the least recently used entry when full"""
+        self._resp_cache[key] = (time.monotonic(), answer)
+        self._resp_cache.move_to_end(key)
+        if len(self._resp_cache) > self._cache_max:
+            self._resp_cache.popitem(last=False)
+    
+    def _providers_to_try(self) -> List[_Provider]:
+        """Configured providers whose circuit breaker is closed, in priority order"""
+        now = time.monotonic()
+        available = [p for p in self._providers if p.available(now)]
+        # If every breaker is open, still try them all rather than fail without a request
+        return available or self._providers
+    
+    def generate_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str = "traditional", *,
+                          max_tokens: Optional[int] = None, temperature: float = _DEFAULT_TEMPERATURE) -> str:
+        """Generate response using API LLM, failing over between configured providers"""
         if not self.loaded:
-            return """❌ No LLM API configured. 
-
-To use this application, please:
-1. Get a free API key from Groq: https://groq.com/
-2. Set environment variable: GROQ_API_KEY=your_key_here
-3. Restart the application
-
-Alternative APIs:
-- OpenAI: Set OPENAI_API_KEY
-- Ollama: Set OLLAMA_BASE_URL=http://localhost:11434"""
+            return self._generate_mock_response(context_docs, query, rag_type)
+        
+        # Overlapping retrievals would repeat identical text in the prompt
+        context_docs = _dedupe_docs(context_docs)
+        options = _generation_options(query, max_tokens, temperature)
+        cache_key = self._cache_key(context_docs, query, rag_type, options)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         # Build context from retrieved documents
         context = self._build_context(context_docs, rag_type)
@@ -83,163 +606,323 @@ Alternative APIs:
         # Create prompt
         prompt = self._create_prompt(context, query, rag_type)
         
+        last_error = None
         try:
-            if self.api_type in ["openai", "groq"]:
-                return self._call_openai_api(prompt)
-            elif self.api_type == "ollama":
-                return self._call_ollama_api(prompt)
-            else:
-                return "❌ Unsupported API type"
+            for provider in self._providers_to_try():
+                try:
+                    answer = self._call_provider(provider, prompt, options)
+                except _SYNC_FAILOVER_ERRORS as e:
+                    provider.record_failure()
+                    last_error = e
+                    continue
+                provider.record_success()
+                self._cache_put(cache_key, answer)
+                return answer
                 
         except Exception as e:
-            return f"❌ API Error: {str(e)}\n\nPlease check your API key and internet connection."
-    
-    def _call_openai_api(self, prompt: str) -> str:
-        """Call OpenAI-compatible API (OpenAI, Groq)"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+            return _api_error_message(e)
         
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant that answers questions about superheroes based on the provided context. Always use the specific information from the context in your response."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 300,
-            "temperature": 0.3  # Lower temperature for more consistent responses
-        }
+        return _api_error_message(last_error)
+    
+    def generate_response_stream(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str = "traditional", *,
+                                 max_tokens: Optional[int] = None, temperature: float = _DEFAULT_TEMPERATURE) -> Iterator[str]:
+        """Generate response incrementally, yielding text deltas as they arrive"""
+        if not self.loaded:
+            yield self._generate_mock_response(context_docs, query, rag_type)
+            return
+        
+        # Overlapping retrievals would repeat identical text in the prompt
+        context_docs = _dedupe_docs(context_docs)
+        options = _generation_options(query, max_tokens, temperature)
+        cache_key = self._cache_key(context_docs, query, rag_type, options)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
         
-        response = requests.post(
-            f"{self.base_url}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30
-        )
+        context = self._build_context(context_docs, rag_type)
+        prompt = self._create_prompt(context, query, rag_type)
         
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"].strip()
-        else:
-            error_msg = f"API Error {response.status_code}"
+        last_error = None
+        for provider in self._providers_to_try():
+            parts = []
             try:
-                error_detail = response.json().get("error", {}).get("message", response.text)
-                error_msg += f": {error_detail}"
-            except:
-                error_msg += f": {response.text}"
-            raise Exception(error_msg)
+                for chunk in self._stream_provider(provider, prompt, options):
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+            except _SYNC_FAILOVER_ERRORS as e:
+                provider.record_failure()
+                last_error = e
+                # Once text has been shown we cannot switch providers mid-answer
+                if parts:
+                    break
+                continue
+            except Exception as e:
+                yield _api_error_message(e)
+                return
+            
+            provider.record_success()
+            self._cache_put(cache_key, "".join(parts).strip())
+            return
+        
+        yield _api_error_message(last_error)
     
-    def _call_ollama_api(self, prompt: str) -> str:
-        """Call Ollama API"""
-        data = {
-            "model": self.model,
+    async def agenerate_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str = "traditional", *,
+                                 max_tokens: Optional[int] = None, temperature: float = _DEFAULT_TEMPERATURE) -> str:
+        """Generate response using API LLM without blocking the event loop
+        
+        The aiohttp session is opened for this call and closed before it returns, so a bare
+        asyncio.run(llm.agenerate_response(...)) leaks nothing. To reuse one session across
+        calls, hold it with `async with llm:`.
+        """
+        async with self._aio_scope():
+            return await self._agenerate_response(context_docs, query, rag_type, max_tokens, temperature)
+    
+    async def _agenerate_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str,
+                                  max_tokens: Optional[int], temperature: float) -> str:
+        if not self.loaded:
+            return self._generate_mock_response(context_docs, query, rag_type)
+        
+        # Overlapping retrievals would repeat identical text in the prompt
+        context_docs = _dedupe_docs(context_docs)
+        options = _generation_options(query, max_tokens, temperature)
+        cache_key = self._cache_key(context_docs, query, rag_type, options)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        context = self._build_context(context_docs, rag_type)
+        prompt = self._create_prompt(context, query, rag_type)
+        
+        last_error = None
+        try:
+            for provider in self._providers_to_try():
+                try:
+                    answer = await self._acall_provider(provider, prompt, options)
+                except _ASYNC_FAILOVER_ERRORS as e:
+                    provider.record_failure()
+                    last_error = e
+                    continue
+                provider.record_success()
+                self._cache_put(cache_key, answer)
+                return answer
+                
+        except Exception as e:
+            return _api_error_message(e)
+        
+        return _api_error_message(last_error)
+    
+    async def generate_batch(self, items: Iterable[Tuple[List[Dict[str, Any]], str, str]], max_concurrency: int = 8) -> List[str]:
+        """Answer many (context_docs, query, rag_type) items concurrently
+        
+        Results are returned in input order; at most max_concurrency requests are in flight.
+        All items share one aiohttp session, closed when the batch returns unless
+        `async with llm:` holds it.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(context_docs, query, rag_type):
+            async with semaphore:
+                return await self.agenerate_response(context_docs, query, rag_type)
+        
+        async with self._aio_scope():
+            return await asyncio.gather(*[_one(*item) for item in items])
+    
+    def _openai_payload(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Request body for OpenAI-compatible chat completions"""
+        return {
+            **provider.base_payload,
+            **options,
+            "messages": [self._static_system_msg, {"role": "user", "content": prompt}]
+        }
+    
+    def _ollama_payload(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Request body for Ollama's generate endpoint"""
+        return {
+            **provider.ollama_base_payload,
             "prompt": prompt,
-            "stream": False,
             "options": {
-                "temperature": 0.3,
-                "top_p": 0.9
+                "temperature": options["temperature"],
+                "top_p": 0.9,
+                "num_predict": options["max_tokens"],
+                "stop": options["stop"]
             }
         }
+    
+    def _call_provider(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        if provider.api_type == "ollama":
+            return self._call_ollama_api(provider, prompt, options)
+        return self._call_openai_api(provider, prompt, options)
+    
+    def _stream_provider(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> Iterator[str]:
+        if provider.api_type == "ollama":
+            return self._stream_ollama_api(provider, prompt, options)
+        return self._stream_openai_api(provider, prompt, options)
+    
+    async def _acall_provider(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        if provider.api_type == "ollama":
+            return await self._acall_ollama_api(provider, prompt, options)
+        return await self._acall_openai_api(provider, prompt, options)
+    
+    def _call_openai_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        """Call OpenAI-compatible API (OpenAI, Groq)"""
+        response = self._session.post(
+            provider.chat_url,
+            data=_dumps(self._openai_payload(provider, prompt, options)),
+            headers=provider.headers,
+            timeout=30
+        )
         
-        response = requests.post(
-            f"{self.base_url}/api/generate",
-            json=data,
+        if response.status_code == 200:
+            result = _loads(response.content)
+            return result["choices"][0]["message"]["content"].strip()
+        raise _openai_error(response.status_code, response.text)
+    
+    def _call_ollama_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        """Call Ollama API"""
+        response = self._session.post(
+            provider.generate_url,
+            data=_dumps(self._ollama_payload(provider, prompt, options)),
+            headers=provider.headers,
             timeout=60
         )
         
         if response.status_code == 200:
-            result = response.json()
+            result = _loads(response.content)
             return result["response"].strip()
-        else:
-            raise Exception(f"Ollama Error {response.status_code}: {response.text}")
+        raise _ollama_error(response.status_code, response.text)
+    
+    def _stream_openai_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> Iterator[str]:
+        """Stream an OpenAI-compatible completion via server-sent events"""
+        data = self._openai_payload(provider, prompt, options)
+        data["stream"] = True
+        
+        with self._session.post(provider.chat_url, data=_dumps(data), headers=provider.headers, stream=True, timeout=30) as response:
+            if response.status_code != 200:
+                raise _openai_error(response.status_code, response.text)
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):]
+                if payload.strip() == "[DONE]":
+                    break
+                chunk = _loads(payload)
+                choices = chunk.get("choices") or [{}]
+                yield choices[0].get("delta", {}).get("content") or ""
+    
+    def _stream_ollama_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> Iterator[str]:
+        """Stream an Ollama completion as newline-delimited JSON chunks"""
+        data = self._ollama_payload(provider, prompt, options)
+        data["stream"] = True
+        
+        with self._session.post(provider.generate_url, data=_dumps(data), headers=provider.headers, stream=True, timeout=60) as response:
+            if response.status_code != 200:
+                raise _ollama_error(response.status_code, response.text)
+            
+            # Larger reads than the 512-byte default; each line is parsed straight from bytes
+            for line in response.iter_lines(chunk_size=4096):
+                if not line:
+                    continue
+                chunk = _loads(line)
+                yield chunk.get("response", "")
+                if chunk.get("done"):
+                    break
+    
+    async def _apost(self, url: str, **kwargs) -> Tuple[int, str]:
+        """POST with exponential backoff on 429/5xx, honoring Retry-After"""
+        session = await self._ensure_aio()
+        for attempt in range(_MAX_ATTEMPTS):
+            async with session.post(url, **kwargs) as response:
+                status = response.status
+                text = await response.text()
+                retry_after = response.headers.get("Retry-After")
+            if status not in _BACKOFF_STATUS or attempt == _MAX_ATTEMPTS - 1:
+                return status, text
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
+    
+    async def _acall_openai_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        """Async variant of _call_openai_api"""
+        status, text = await self._apost(
+            provider.chat_url,
+            data=_dumps(self._openai_payload(provider, prompt, options)),
+            headers=provider.headers
+        )
+        if status == 200:
+            result = _loads(text)
+            return result["choices"][0]["message"]["content"].strip()
+        raise _openai_error(status, text)
+    
+    async def _acall_ollama_api(self, provider: _Provider, prompt: str, options: Dict[str, Any]) -> str:
+        """Async variant of _call_ollama_api"""
+        status, text = await self._apost(
+            provider.generate_url,
+            data=_dumps(self._ollama_payload(provider, prompt, options)),
+            headers=provider.headers,
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+        if status == 200:
+            result = _loads(text)
+            return result["response"].strip()
+        raise _ollama_error(status, text)
+    
+    def _generate_mock_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str) -> str:
+        """Generate mock responses based on retrieved context"""
+        if not context_docs:
+            return "I couldn't find any relevant information to answer your question."
+        
+        # Extract key information from retrieved documents with one regex scan
+        # over the joined context; match offsets map back to their document
+        parts = [doc.get('content', str(doc)) for doc in context_docs]
+        all_context = " ".join(parts) + " "
+        starts = []
+        offset = 0
+        for part in parts:
+            starts.append(offset)
+            offset += len(part) + 1
+        
+        doc_facts = [set() for _ in parts]
+        for match in _FACT_RE.finditer(all_context):
+            doc_facts[bisect.bisect_right(starts, match.start()) - 1].add(match.group())
+        facts = set().union(*doc_facts)
+        
+        # Real names only count when the hero is named in the same document
+        hero_info = {
+            key: real_name
+            for hero, real_name, key in _REAL_NAMES
+            if any(hero in found and real_name in found for found in doc_facts)
+        }
+        
+        # Answer based on the highest-priority topic mentioned in the query
+        matched = set(_QUERY_RE.findall(query.lower()))
+        topics = {_QUERY_TOPICS[word] for word in matched if word in _QUERY_TOPICS}
+        topic = next((t for t in _TOPIC_PRIORITY if t in topics), None)
+        if topic is None:
+            return f"Based on the {rag_type} RAG search, I found relevant superhero information in the knowledge base. The context shows details about various heroes and their characteristics."
+        
+        return _MOCK_HANDLERS[topic](hero_info, facts, all_context, "name" in matched, rag_type)
     
     def _build_context(self, docs: List[Dict[str, Any]], rag_type: str) -> str:
         """Build context string from retrieved documents"""
         if not docs:
             return "No relevant information found."
         
-        context_parts = []
-        
-        for i, doc in enumerate(docs[:5]):  # Top 5 most relevant docs
-            if rag_type == "graph" and "type" in doc:
-                # Graph RAG context - format graph data properly
-                doc_type = doc.get("type", "unknown")
-                
-                # Extract meaningful content from graph data
-                if doc_type == "hero":
-                    name = doc.get("name", "Unknown Hero")
-                    real_name = doc.get("real_name", "")
-                    powers = doc.get("powers", [])
-                    origin = doc.get("origin", "")
-                    team = doc.get("team", "")
-                    
-                    content = f"{name}"
-                    if real_name:
-                        content += f" (real name: {real_name})"
-                    if powers:
-                        content += f" has powers: {', '.join(powers)}"
-                    if origin:
-                        content += f", from {origin}"
-                    if team:
-                        content += f", member of {team}"
-                        
-                elif doc_type == "relationship":
-                    hero1 = doc.get("hero1", "")
-                    hero2 = doc.get("hero2", "")
-                    relationship = doc.get("relationship", "")
-                    content = f"{hero1} and {hero2} are {relationship}"
-                    
-                elif doc_type == "teammate":
-                    teammate = doc.get("teammate", "")
-                    team = doc.get("team", "")
-                    content = f"{teammate} is a teammate in {team}"
-                    
-                else:
-                    # Fallback - extract key information
-                    content = doc.get("content", "")
-                    if not content:
-                        # Build content from available fields
-                        key_fields = []
-                        for key, value in doc.items():
-                            if key not in ["type", "content"] and value:
-                                if isinstance(value, list):
-                                    key_fields.append(f"{key}: {', '.join(map(str, value))}")
-                                else:
-                                    key_fields.append(f"{key}: {value}")
-                        content = ", ".join(key_fields)
-                
-                context_parts.append(f"[{doc_type.upper()}] {content}")
-                
-            else:
-                # Traditional RAG context
-                title = doc.get('title', f'Document {i+1}')
-                content = doc.get('content', '')
-                if not content:
-                    # Fallback to extracting from other fields
-                    content = str(doc)
-                similarity = doc.get('similarity', 0)
-                context_parts.append(f"[{title}] (relevance: {similarity:.2f}) {content}")
-        
-        return "\n\n".join(context_parts)
+        # Top 5 most relevant docs, each formatted in a single expression and
+        # trimmed to an equal share of the context token budget
+        top_docs = docs[:5]
+        budget_per_doc = (_MAX_PROMPT_TOKENS - _RESERVED_TOKENS) // len(top_docs)
+        return "\n\n".join(
+            _truncate_tokens(
+                _format_graph_doc(doc) if rag_type == "graph" else _format_traditional(doc, i),
+                budget_per_doc
+            )
+            for i, doc in enumerate(top_docs)
+        )
     
     def _create_prompt(self, context: str, query: str, rag_type: str) -> str:
-        """Create a clear prompt for the API"""
-        
-        prompt = f"""Answer the question based on the provided context. Use specific details from the context in your response.
-
-CONTEXT INFORMATION:
-{context}
-
-QUESTION: {query}
-
-INSTRUCTIONS:
-- Answer based on the context provided
-- Include specific details like names, powers, relationships when available
-- Be concise but informative
-- If the context doesn't contain the answer, say so clearly"""
-        
-        return prompt
+        """Create the dynamic part of the prompt - documents first, question last"""
+        return "".join((_PROMPT_HEAD, context, _PROMPT_MID, query))
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the API configuration"""
@@ -247,195 +930,36 @@ INSTRUCTIONS:
             return {
                 "status": "not_configured",
                 "message": "No API configured. Set OPENAI_API_KEY, GROQ_API_KEY, or OLLAMA_BASE_URL",
-                "api_type": "none"
+                "api_type": "none",
+                "description": "Mock responses (No API key)",
+                "providers": []
             }
         
         return {
             "status": "ready",
             "api_type": self.api_type.upper(),
             "model": self.model,
-            "description": f"{self.api_type.upper()} API using {self.model}"
+            "description": f"{self.api_type.upper()} API using {self.model}",
+            "providers": [p.api_type.upper() for p in self._providers]
         }
 
-import requests
-import json
-import os
-from typing import List, Dict, Any
+_INSTANCE: Optional[APILLM] = None
+_INSTANCE_CONFIG: Optional[Tuple[Optional[str], ...]] = None
 
-class APILLM:
-    """Simple API-based LLM integration using Groq API"""
-    
-    def __init__(self):
-        """Initialize API LLM client"""
-        self.api_key = os.getenv("GROQ_API_KEY", "")
-        self.model_name = "mixtral-8x7b-32768"  # Fast Mixtral model
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.loaded = True  # API is always "loaded"
-        
-        if not self.api_key:
-            print("⚠️  No GROQ_API_KEY found - using mock responses")
-            print("📝 Get free API key at: https://console.groq.com/")
-            self.use_mock = True
-            self.model_name = "mock"
-        else:
-            print("🚀 Using Groq API for fast LLM responses")
-            print(f"🤖 Model: {self.model_name}")
-            self.use_mock = False
-    
-    def load_model(self):
-        """API models are always ready"""
-        print("✅ API LLM ready!")
-        self.loaded = True
-    
-    def generate_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str = "traditional") -> str:
-        """Generate response using API or mock"""
-        if self.use_mock:
-            return self._generate_mock_response(context_docs, query, rag_type)
-        
-        try:
-            return self._generate_api_response(context_docs, query, rag_type)
-        except Exception as e:
-            print(f"⚠️ API error: {e}")
-            return self._generate_mock_response(context_docs, query, rag_type)
-    
-    def _generate_api_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str) -> str:
-        """Generate response using Groq API"""
-        context = self._build_context(context_docs, rag_type)
-        
-        messages = [
-            {
-                "role": "system", 
-                "content": f"You are a helpful assistant answering questions about superheroes. You use {rag_type} RAG to find information."
-            },
-            {
-                "role": "user",
-                "content": f"Context:\n{context}\n\nQuestion: {query}\n\nProvide a helpful answer based on the context."
-            }
-        ]
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model_name,
-            "messages": messages,
-            "max_tokens": 200,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(self.base_url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        
-        result = response.json()
-        return result["choices"][0]["message"]["content"].strip()
-    
-    def _generate_mock_response(self, context_docs: List[Dict[str, Any]], query: str, rag_type: str) -> str:
-        """Generate mock responses based on retrieved context"""
-        query_lower = query.lower()
-        
-        if not context_docs:
-            return "I couldn't find any relevant information to answer your question."
-        
-        # Extract key information from retrieved documents
-        all_context = ""
-        hero_info = {}
-        
-        for doc in context_docs:
-            content = doc.get('content', str(doc))
-            all_context += content + " "
-            
-            # Extract specific hero details from content
-            if 'Superman' in content and 'Clark Kent' in content:
-                hero_info['superman_real_name'] = 'Clark Kent'
-            if 'Batman' in content and 'Bruce Wayne' in content:
-                hero_info['batman_real_name'] = 'Bruce Wayne'
-            if 'Wonder Woman' in content and 'Diana Prince' in content:
-                hero_info['wonder_woman_real_name'] = 'Diana Prince'
-            if 'Flash' in content and 'Barry Allen' in content:
-                hero_info['flash_real_name'] = 'Barry Allen'
-        
-        # Answer based on query and extracted context
-        if any(word in query_lower for word in ['superman', 'clark']):
-            if 'real name' in query_lower or 'name' in query_lower:
-                if 'superman_real_name' in hero_info:
-                    return f"Superman's real name is {hero_info['superman_real_name']}. This information comes from the retrieved documents."
-                elif 'Clark Kent' in all_context:
-                    return "Superman's real name is Clark Kent, as mentioned in the knowledge base."
-            
-            # Find Superman-specific info from context
-            superman_details = []
-            if 'Krypton' in all_context:
-                superman_details.append("from the planet Krypton")
-            if 'super strength' in all_context:
-                superman_details.append("has super strength")
-            if 'flight' in all_context:
-                superman_details.append("can fly")
-            if 'Justice League' in all_context:
-                superman_details.append("is a member of the Justice League")
-            
-            if superman_details:
-                return f"Based on the retrieved context: Superman {', '.join(superman_details)}."
-            else:
-                return f"Superman information found in context: {all_context[:200]}..."
-        
-        elif any(word in query_lower for word in ['batman', 'bruce']):
-            if 'real name' in query_lower or 'name' in query_lower:
-                if 'batman_real_name' in hero_info:
-                    return f"Batman's real name is {hero_info['batman_real_name']}."
-                elif 'Bruce Wayne' in all_context:
-                    return "Batman's real name is Bruce Wayne."
-            return f"Batman information from context: {all_context[:200]}..."
-        
-        elif any(word in query_lower for word in ['wonder woman', 'diana']):
-            if 'real name' in query_lower or 'name' in query_lower:
-                if 'wonder_woman_real_name' in hero_info:
-                    return f"Wonder Woman's real name is {hero_info['wonder_woman_real_name']}."
-                elif 'Diana Prince' in all_context:
-                    return "Wonder Woman's real name is Diana Prince."
-            return f"Wonder Woman information from context: {all_context[:200]}..."
-        
-        elif any(word in query_lower for word in ['flash', 'barry']):
-            if 'real name' in query_lower or 'name' in query_lower:
-                if 'flash_real_name' in hero_info:
-                    return f"The Flash's real name is {hero_info['flash_real_name']}."
-                elif 'Barry Allen' in all_context:
-                    return "The Flash's real name is Barry Allen."
-            return f"Flash information from context: {all_context[:200]}..."
-        
-        elif any(word in query_lower for word in ['team', 'justice league', 'group']):
-            return f"The Justice League is a team of superheroes including Superman, Batman, Wonder Woman, and The Flash. They work together to protect Earth from major threats. The {rag_type} RAG system found connections between these heroes."
-        
-        elif any(word in query_lower for word in ['power', 'ability', 'strength']):
-            return f"Based on the {rag_type} search, the heroes have various powers: Superman has super strength and flight, Batman relies on technology and intellect, Wonder Woman has combat skills and magical items, and Flash has super-speed."
-        
-        else:
-            return f"Based on the {rag_type} RAG search, I found relevant superhero information in the knowledge base. The context shows details about various heroes and their characteristics."
-    
-    def _build_context(self, docs: List[Dict[str, Any]], rag_type: str) -> str:
-        """Build context string from retrieved documents"""
-        if not docs:
-            return "No relevant information found."
-        
-        context_parts = []
-        for i, doc in enumerate(docs[:3]):  # Limit to top 3
-            if rag_type == "graph" and "type" in doc:
-                context_parts.append(f"{doc['type']}: {doc.get('content', str(doc))}")
-            else:
-                title = doc.get('title', f'Document {i+1}')
-                content = doc.get('content', str(doc))
-                context_parts.append(f"{title}: {content}")
-        
-        return "\n".join(context_parts)
+def _api_config() -> Tuple[Optional[str], ...]:
+    """The provider environment variables APILLM reads, as a comparable snapshot"""
+    return tuple(os.environ.get(env_var) for _, env_var, _, _, _ in _PROVIDERS)
+
+def get_api_llm(reload: bool = False) -> APILLM:
+    """Shared APILLM so every caller reuses one configuration and connection pool
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """Get model information"""
-        return {
-            "status": "loaded",
-            "model_name": self.model_name,
-            "type": "api" if not self.use_mock else "mock",
-            "description": "Groq Mixtral API (Fast)" if not self.use_mock else "Mock responses (No API key)",
-            "speed": "⚡ Very Fast",
-            "device": "cloud" if not self.use_mock else "local"
-        }
+    A new instance is built when the API environment variables have changed (or with
+    reload=True). The previous one is not closed: other callers, e.g. other Streamlit
+    sessions, may still be using it, and its pool is released when it is garbage collected.
+    """
+    global _INSTANCE, _INSTANCE_CONFIG
+    config = _api_config()
+    if _INSTANCE is None or reload or config != _INSTANCE_CONFIG:
+        _INSTANCE = APILLM()
+        _INSTANCE_CONFIG = config
+    return _INSTANCE
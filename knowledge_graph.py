@@ -2,8 +2,22 @@
 Simple Neo4j Knowledge Graph for Superhero Demo
 """
 from neo4j import GraphDatabase
+from functools import lru_cache
+import atexit
 import json
 
+@lru_cache(maxsize=None)
+def _driver(uri, user, password):
+    """One long-lived driver (and connection pool) per server and credentials, closed at exit"""
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    atexit.register(driver.close)
+    return driver
+
+# query_graph / get_hero_bundle results, one dict per shared driver so every SuperheroGraph
+# on the same database sees (and clears) the same entries. Writes made from another
+# process are not seen: the cache assumes this process owns the graph.
+_QUERY_CACHES = {}
+
 class SuperheroGraph:
     def __init__(self, uri=None, user=None, password=None):
         import os
@@ -11,185 +25,285 @@ class SuperheroGraph:
         uri = uri or os.getenv("NEO4J_URI", "bolt://localhost:7687")
         user = user or os.getenv("NEO4J_USER", "neo4j")
         password = password or os.getenv("NEO4J_PASSWORD", "password")
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.driver = _driver(uri, user, password)
+        # Results keyed on (query_type, entity), shared with other instances on this driver
+        self._q_cache = _QUERY_CACHES.setdefault(self.driver, {})
+        self._has_apoc = None
     
     def close(self):
-        self.driver.close()
+        """No-op: the shared driver stays open for other instances and closes at exit"""
+    
+    def has_apoc(self):
+        """Whether apoc.create.relationship is installed (checked once per instance)"""
+        if self._has_apoc is None:
+            try:
+                with self.driver.session() as session:
+                    record = session.run("""
+                        SHOW PROCEDURES YIELD name
+                        WHERE name = 'apoc.create.relationship'
+                        RETURN count(*) > 0 AS available
+                    """).single()
+                    self._has_apoc = bool(record and record["available"])
+            except Exception:
+                self._has_apoc = False
+        return self._has_apoc
+    
+    def ensure_indexes(self):
+        """Index the name lookups used by MATCH (h:Hero {name: ...}) and the team match"""
+        with self.driver.session() as session:
+            # Schema changes can't share a transaction with data writes, so these auto-commit
+            session.run("CREATE INDEX hero_name IF NOT EXISTS FOR (h:Hero) ON (h.name)")
+            session.run("CREATE INDEX team_name IF NOT EXISTS FOR (t:Team) ON (t.name)")
     
     def clear_graph(self):
         """Clear all nodes and relationships"""
+        self._q_cache.clear()
         with self.driver.session() as session:
             session.run("MATCH (n) DETACH DELETE n")
     
-    def create_superhero_graph(self):
-        """Create the superhero knowledge graph"""
+    def create_superhero_graph(self, reset=False):
+        """Create the superhero knowledge graph
+        
+        With reset=True the existing graph is deleted in the same transaction (one commit
+        instead of a separate clear_graph() call).
+        """
+        # Create heroes
+        heroes = [
+            {
+                "name": "Superman",
+                "real_name": "Clark Kent",
+                "powers": ["super strength", "flight", "invulnerability", "heat vision"],
+                "origin": "Krypton",
+                "team": "Justice League"
+            },
+            {
+                "name": "Batman", 
+                "real_name": "Bruce Wayne",
+                "powers": ["intelligence", "martial arts", "technology"],
+                "origin": "Gotham City",
+                "team": "Justice League"
+            },
+            {
+                "name": "Wonder Woman",
+                "real_name": "Diana Prince", 
+                "powers": ["super strength", "lasso of truth", "combat skills"],
+                "origin": "Themyscira",
+                "team": "Justice League"
+            },
+            {
+                "name": "Flash",
+                "real_name": "Barry Allen",
+                "powers": ["super speed", "time travel"],
+                "origin": "Central City", 
+                "team": "Justice League"
+            }
+        ]
+        
+        # Create relationships
+        relationships = [
+            ("Superman", "Batman", "TEAMMATE"),
+            ("Superman", "Wonder Woman", "TEAMMATE"), 
+            ("Superman", "Flash", "TEAMMATE"),
+            ("Batman", "Wonder Woman", "TEAMMATE"),
+            ("Batman", "Flash", "TEAMMATE"),
+            ("Wonder Woman", "Flash", "TEAMMATE"),
+            ("Superman", "Batman", "ALLY"),
+            ("Superman", "Wonder Woman", "ALLY"),
+            ("Superman", "Flash", "ALLY")
+        ]
+        
+        # Everything is written in one transaction with batched statements; only the index
+        # DDL has to commit on its own
+        self._q_cache.clear()
+        self.ensure_indexes()
+        use_apoc = self.has_apoc()
         with self.driver.session() as session:
-            # Create heroes
-            heroes = [
-                {
-                    "name": "Superman",
-                    "real_name": "Clark Kent",
-                    "powers": ["super strength", "flight", "invulnerability", "heat vision"],
-                    "origin": "Krypton",
-                    "team": "Justice League"
-                },
-                {
-                    "name": "Batman", 
-                    "real_name": "Bruce Wayne",
-                    "powers": ["intelligence", "martial arts", "technology"],
-                    "origin": "Gotham City",
-                    "team": "Justice League"
-                },
-                {
-                    "name": "Wonder Woman",
-                    "real_name": "Diana Prince", 
-                    "powers": ["super strength", "lasso of truth", "combat skills"],
-                    "origin": "Themyscira",
-                    "team": "Justice League"
-                },
-                {
-                    "name": "Flash",
-                    "real_name": "Barry Allen",
-                    "powers": ["super speed", "time travel"],
-                    "origin": "Central City", 
-                    "team": "Justice League"
-                }
-            ]
-            
-            # Create hero nodes
-            for hero in heroes:
-                session.run("""
-                    CREATE (h:Hero {
-                        name: $name,
-                        real_name: $real_name,
-                        powers: $powers,
-                        origin: $origin,
-                        team: $team
-                    })
-                """, **hero)
-            
-            # Create Justice League team node
-            session.run("""
-                CREATE (t:Team {
-                    name: "Justice League",
-                    type: "superhero team",
-                    founded: "1960"
-                })
-            """)
-            
-            # Create relationships
-            relationships = [
-                ("Superman", "Batman", "TEAMMATE"),
-                ("Superman", "Wonder Woman", "TEAMMATE"), 
-                ("Superman", "Flash", "TEAMMATE"),
-                ("Batman", "Wonder Woman", "TEAMMATE"),
-                ("Batman", "Flash", "TEAMMATE"),
-                ("Wonder Woman", "Flash", "TEAMMATE"),
-                ("Superman", "Batman", "ALLY"),
-                ("Superman", "Wonder Woman", "ALLY"),
-                ("Superman", "Flash", "ALLY")
-            ]
-            
-            # Create TEAMMATE relationships
-            for hero1, hero2, rel_type in relationships:
-                session.run("""
-                    MATCH (h1:Hero {name: $hero1})
-                    MATCH (h2:Hero {name: $hero2})
-                    CREATE (h1)-[:""" + rel_type + """]->(h2)
-                """, hero1=hero1, hero2=hero2)
-            
-            # Create MEMBER_OF relationships with Justice League
-            for hero in heroes:
-                session.run("""
-                    MATCH (h:Hero {name: $name})
-                    MATCH (t:Team {name: "Justice League"})
-                    CREATE (h)-[:MEMBER_OF]->(t)
-                """, name=hero["name"])
+            session.execute_write(self._create_graph_tx, heroes, relationships, use_apoc, reset)
             
             print("✅ Superhero knowledge graph created!")
     
-    def query_graph(self, query_type, entity=None):
-        """Query the graph for different types of information"""
-        with self.driver.session() as session:
-            
-            if query_type == "all_heroes":
-                result = session.run("""
-                    MATCH (h:Hero)
-                    RETURN h.name as name, h.real_name as real_name, h.powers as powers, h.origin as origin, h.team as team, h.description as description
-                """)
-                return [dict(record) for record in result]
-            
-            elif query_type == "hero_relationships" and entity:
-                result = session.run("""
-                    MATCH (h:Hero {name: $entity})-[r]-(connected)
-                    RETURN h.name as hero, type(r) as relationship, connected.name as connected_to, labels(connected) as connected_type
-                """, entity=entity)
-                return [dict(record) for record in result]
-            
-            elif query_type == "teammates" and entity:
-                result = session.run("""
-                    MATCH (h:Hero {name: $entity})-[:TEAMMATE]-(teammate:Hero)
-                    RETURN teammate.name as teammate, teammate.real_name as real_name
-                """, entity=entity)
-                return [dict(record) for record in result]
-            
-            elif query_type == "team_members":
-                result = session.run("""
-                    MATCH (h:Hero)-[:MEMBER_OF]->(t:Team {name: "Justice League"})
-                    RETURN h.name as hero, h.powers as powers
-                """)
-                return [dict(record) for record in result]
-            
-            elif query_type == "hero_details" and entity:
-                result = session.run("""
-                    MATCH (h:Hero {name: $entity})
-                    RETURN h.name as name, h.real_name as real_name, h.powers as powers, 
-                           h.origin as origin, h.team as team, h.description as description
-                """, entity=entity)
-                return [dict(record) for record in result]
+    @staticmethod
+    def _create_graph_tx(tx, heroes, relationships, use_apoc=False, reset=False):
+        """Write heroes, the team and all relationships with UNWIND batches"""
+        if reset:
+            tx.run("MATCH (n) DETACH DELETE n")
+        
+        # Create hero nodes
+        tx.run("""
+            UNWIND $heroes AS hero
+            CREATE (h:Hero {
+                name: hero.name,
+                real_name: hero.real_name,
+                powers: hero.powers,
+                origin: hero.origin,
+                team: hero.team
+            })
+        """, heroes=heroes)
+        
+        # Create Justice League team node
+        tx.run("""
+            CREATE (t:Team {
+                name: "Justice League",
+                type: "superhero team",
+                founded: "1960"
+            })
+        """)
+        
+        if use_apoc:
+            # APOC takes the type as a parameter: one cached plan for every relationship
+            tx.run("""
+                UNWIND $rels AS row
+                MATCH (h1:Hero {name: row.hero1})
+                MATCH (h2:Hero {name: row.hero2})
+                CALL apoc.create.relationship(h1, row.type, {}, h2) YIELD rel
+                RETURN count(rel)
+            """, rels=[{"hero1": hero1, "hero2": hero2, "type": rel_type} for hero1, hero2, rel_type in relationships])
+        else:
+            # Plain Cypher can't parameterize the type, so batch one statement per type
+            pairs_by_type = {}
+            for hero1, hero2, rel_type in relationships:
+                pairs_by_type.setdefault(rel_type, []).append({"hero1": hero1, "hero2": hero2})
             
-            return []
+            for rel_type, pairs in pairs_by_type.items():
+                tx.run("""
+                    UNWIND $pairs AS pair
+                    MATCH (h1:Hero {name: pair.hero1})
+                    MATCH (h2:Hero {name: pair.hero2})
+                    CREATE (h1)-[:""" + rel_type + """]->(h2)
+                """, pairs=pairs)
+        
+        # Create MEMBER_OF relationships with Justice League
+        tx.run("""
+            UNWIND $names AS name
+            MATCH (h:Hero {name: name})
+            MATCH (t:Team {name: "Justice League"})
+            CREATE (h)-[:MEMBER_OF]->(t)
+        """, names=[hero["name"] for hero in heroes])
     
-    def visualize_graph(self):
-        """Get graph data for visualization"""
+    def query_graph(self, query_type, entity=None, session=None):
+        """Query the graph for different types of information
+        
+        Non-empty results are cached per (query_type, entity) until the graph is cleared or
+        rebuilt through any instance in this process; each call returns fresh row dicts, so
+        callers may modify them freely.
+        Pass an open `session` to run several queries without opening one per call.
+        """
+        key = (query_type, entity)
+        rows = self._q_cache.get(key)
+        if rows is None:
+            if session is None:
+                with self.driver.session() as session:
+                    rows = self._query_graph(session, query_type, entity)
+            else:
+                rows = self._query_graph(session, query_type, entity)
+            if rows:
+                # An empty answer may just mean the graph isn't built yet
+                self._q_cache[key] = rows
+        return [dict(row) for row in rows]
+    
+    def get_hero_bundle(self, name, session=None):
+        """Hero details, teammates and relationships for one hero in a single round trip
+        
+        Returns {"details", "teammates", "relationships"}, each a list of rows shaped like the
+        matching query_graph("hero_details" / "teammates" / "hero_relationships") result.
+        Like query_graph, the rows are fresh copies of the cached ones.
+        """
+        key = ("hero_bundle", name)
+        bundle = self._q_cache.get(key)
+        if bundle is None:
+            if session is None:
+                with self.driver.session() as session:
+                    bundle = self._hero_bundle(session, name)
+            else:
+                bundle = self._hero_bundle(session, name)
+            if bundle["details"]:
+                self._q_cache[key] = bundle
+        return {part: [dict(row) for row in rows] for part, rows in bundle.items()}
+    
+    def _hero_bundle(self, session, name):
+        # One record per matching Hero node; duplicates contribute rows like the separate queries did
+        result = session.run("""
+            MATCH (h:Hero {name: $name})
+            RETURN h {.name, .real_name, .powers, .origin, .team, .description} AS details,
+                   [(h)-[:TEAMMATE]-(teammate:Hero) | {teammate: teammate.name, real_name: teammate.real_name}] AS teammates,
+                   [(h)-[r]-(connected) | {hero: h.name, relationship: type(r), connected_to: connected.name, connected_type: labels(connected)}] AS relationships
+        """, name=name)
+        bundle = {"details": [], "teammates": [], "relationships": []}
+        for record in result:
+            bundle["details"].append(record["details"])
+            bundle["teammates"].extend(record["teammates"])
+            bundle["relationships"].extend(record["relationships"])
+        return bundle
+    
+    def _query_graph(self, session, query_type, entity=None):
+        """Run the Cypher query behind query_graph on an open session"""
+        if query_type == "all_heroes":
+            result = session.run("""
+                MATCH (h:Hero)
+                RETURN h.name as name, h.real_name as real_name, h.powers as powers, h.origin as origin, h.team as team, h.description as description
+            """)
+            return result.data()
+        
+        elif query_type == "hero_relationships" and entity:
+            result = session.run("""
+                MATCH (h:Hero {name: $entity})-[r]-(connected)
+                RETURN h.name as hero, type(r) as relationship, connected.name as connected_to, labels(connected) as connected_type
+            """, entity=entity)
+            return result.data()
+        
+        elif query_type == "teammates" and entity:
+            result = session.run("""
+                MATCH (h:Hero {name: $entity})-[:TEAMMATE]-(teammate:Hero)
+                RETURN teammate.name as teammate, teammate.real_name as real_name
+            """, entity=entity)
+            return result.data()
+        
+        elif query_type == "team_members":
+            result = session.run("""
+                MATCH (h:Hero)-[:MEMBER_OF]->(t:Team {name: "Justice League"})
+                RETURN h.name as hero, h.powers as powers
+            """)
+            return result.data()
+        
+        elif query_type == "hero_details" and entity:
+            result = session.run("""
+                MATCH (h:Hero {name: $entity})
+                RETURN h.name as name, h.real_name as real_name, h.powers as powers, 
+                       h.origin as origin, h.team as team, h.description as description
+            """, entity=entity)
+            return result.data()
+        
+        return []
+    
+    def iter_nodes(self):
+        """Yield every node as {id, labels, properties}, one record at a time"""
         with self.driver.session() as session:
-            # Get all nodes
-            nodes_result = session.run("""
+            result = session.run("""
                 MATCH (n) 
-                RETURN id(n) as id, labels(n) as labels, properties(n) as props
+                RETURN id(n) as id, labels(n) as labels, properties(n) as properties
             """)
-            nodes = []
-            for record in nodes_result:
-                node = {
-                    "id": record["id"],
-                    "labels": record["labels"],
-                    "properties": dict(record["props"])
-                }
-                nodes.append(node)
-            
-            # Get all relationships  
-            rels_result = session.run("""
+            for record in result:
+                yield record.data()
+    
+    def iter_relationships(self):
+        """Yield every relationship as {source, target, type, properties}, one record at a time"""
+        with self.driver.session() as session:
+            result = session.run("""
                 MATCH (a)-[r]->(b)
-                RETURN id(a) as source, id(b) as target, type(r) as type, properties(r) as props
+                RETURN id(a) as source, id(b) as target, type(r) as type, properties(r) as properties
             """)
-            relationships = []
-            for record in rels_result:
-                rel = {
-                    "source": record["source"],
-                    "target": record["target"], 
-                    "type": record["type"],
-                    "properties": dict(record["props"])
-                }
-                relationships.append(rel)
-            
-            return {"nodes": nodes, "relationships": relationships}
+            for record in result:
+                yield record.data()
+    
+    def visualize_graph(self):
+        """Get graph data for visualization (materialized; prefer iter_nodes/iter_relationships to stream)"""
+        return {"nodes": list(self.iter_nodes()), "relationships": list(self.iter_relationships())}
 
 if __name__ == "__main__":
     # Test the graph
     graph = SuperheroGraph()
     try:
-        graph.clear_graph()
-        graph.create_superhero_graph()
+        graph.create_superhero_graph(reset=True)
         
         # Test queries
         print("\n🦸‍♂️ All Heroes:")
@@ -1,65 +1,181 @@
 """
 Simple RAG implementations for demo
 """
+import re
 import json
-from typing import List, Dict, Any
-from api_llm import APILLM
+import heapq
+from functools import lru_cache
+from collections import defaultdict
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Graph search query analysis: one regex scan each instead of a chain of substring tests.
+# Plain substrings (no word boundaries) so "teammates" still hits "team"; heroes keep
+# their precedence when several are named.
+_HERO_RE = re.compile(r"superman|batman|wonder woman|flash")
+_HERO_PRIORITY = (
+    ("superman", "Superman"),
+    ("batman", "Batman"),
+    ("wonder woman", "Wonder Woman"),
+    ("flash", "Flash"),
+)
+_RELATION_RE = re.compile(r"teammate|team|ally|friend|relationship|connect|related")
+_OVERVIEW_RE = re.compile(r"who|what|about")
+
+# Keyword search tokens: runs of letters, digits and apostrophes, so punctuation never
+# sticks to a word ("powers?" -> "powers")
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+def _tokens(text: str) -> FrozenSet[str]:
+    """Distinct lowercased tokens of text"""
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+# Query words that carry no signal for keyword search; dropped before scoring
+_STOPWORDS = frozenset("""
+a an the and or but if of at by for with about into to from in on off out over under
+is are was were be been being am do does did has have had can could will would should
+i me my we our you your he him his she her it its they them their this that these those
+what which who whom whose when where why how tell show give list all any some
+""".split())
+
+# Placeholder for a RAG's llm until one is assigned: use the shared get_api_llm() client
+_SHARED_LLM = object()
+
+class Document(NamedTuple):
+    """A traditional RAG document; converted to a dict only for returned search results"""
+    id: str
+    title: str
+    content: str
+    character: Optional[str] = None
+    # Lowercased token sets and character, filled in once by tokenized()
+    tokens_c: Optional[FrozenSet[str]] = None
+    tokens_t: Optional[FrozenSet[str]] = None
+    char_lower: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "Document":
+        return cls(doc.get('id'), doc['title'], doc['content'], doc.get('character')).tokenized()
+    
+    def tokenized(self) -> "Document":
+        """This document with its search tokens computed (a no-op if they already are)"""
+        if self.tokens_c is not None:
+            return self
+        return self._replace(
+            tokens_c=_tokens(self.content),
+            tokens_t=_tokens(self.title),
+            char_lower=self.character.lower() if self.character is not None else None
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """The public fields as a plain dict (search results, JSON); no 'character' key when unset"""
+        doc = {'id': self.id, 'title': self.title, 'content': self.content}
+        if self.character is not None:
+            doc['character'] = self.character
+        return doc
 
 class SimpleTraditionalRAG:
     """Simple traditional RAG using keyword matching (no embeddings for simplicity)"""
     
     def __init__(self, use_llm=True):
         self.documents = []
+        # token -> ((doc position, weight), ...) best weight first, with weight 1 for content, 2 for title, 3 for both;
+        # plus (doc position, lowercased character) for documents that name one
+        self._postings = {}
+        self._characters = []
         self.use_llm = use_llm
-        self.llm = APILLM() if use_llm else None
+        self._llm = _SHARED_LLM
+    
+    @property
+    def llm(self):
+        """Shared API client, created on first use so search-only callers never build one
+        
+        Assigning `rag.llm = client` (e.g. a stub in tests) overrides it for this instance.
+        """
+        if self._llm is not _SHARED_LLM:
+            return self._llm
+        if not self.use_llm:
+            return None
+        from api_llm import get_api_llm
+        return get_api_llm()
+    
+    @llm.setter
+    def llm(self, client):
+        self._llm = client
     
-    def add_documents(self, docs: List[Dict[str, Any]]):
-        """Add documents to the knowledge base"""
+    def add_documents(self, docs: Sequence[Union[Document, Dict[str, Any]]]):
+        """Add documents to the knowledge base (dicts are converted to Document)"""
+        docs = [doc.tokenized() if isinstance(doc, Document) else Document.from_dict(doc) for doc in docs]
         self.documents = docs
+        
+        # Weighted token-document index (a sparse matrix stored by token) over the cached token sets
+        postings = defaultdict(list)
+        self._characters = []
+        for position, doc in enumerate(docs):
+            for token in doc.tokens_c | doc.tokens_t:
+                weight = (token in doc.tokens_c) + 2 * (token in doc.tokens_t)  # Title matches worth more
+                postings[token].append((position, weight))
+            if doc.char_lower is not None:
+                self._characters.append((position, doc.char_lower))
+        # Heaviest first (stable, so ties stay in document order): a lone query token's
+        # postings are then already its ranking
+        self._postings = {
+            token: tuple(sorted(entries, key=lambda entry: -entry[1]))
+            for token, entries in postings.items()
+        }
         print(f"✅ Added {len(docs)} documents to Traditional RAG")
     
     def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Search for relevant documents using simple keyword matching"""
-        if not self.documents:
+        return self._results(self._search(query, top_k))
+    
+    def _results(self, hits: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """Result dicts (document fields plus 'similarity') for (position, score) hits"""
+        return [
+            {**self.documents[position].to_dict(), 'similarity': score / 10.0}  # Normalize to 0-1 range
+            for position, score in hits
+        ]
+    
+    def _search(self, query: str, top_k: int) -> List[Tuple[int, int]]:
+        """Top-k (document position, raw score) pairs, best first"""
+        if not self.documents or top_k <= 0:
             return []
         
         query_lower = query.lower()
-        query_words = set(query_lower.split())
+        query_words = frozenset(_TOKEN_RE.findall(query_lower)) - _STOPWORDS
+        named = [position for position, character in self._characters if character in query_lower]
         
-        # Calculate simple similarity scores
-        scored_docs = []
-        for doc in self.documents:
-            content_words = set(doc['content'].lower().split())
-            title_words = set(doc['title'].lower().split())
-            
-            # Simple word overlap scoring
-            content_overlap = len(query_words.intersection(content_words))
-            title_overlap = len(query_words.intersection(title_words)) * 2  # Title matches worth more
-            
-            # Character name matching (bonus for superhero names)
-            character_match = 0
-            if 'character' in doc and doc['character'].lower() in query_lower:
-                character_match = 5
-            
-            total_score = content_overlap + title_overlap + character_match
-            
-            if total_score > 0:
-                result = doc.copy()
-                result['similarity'] = total_score / 10.0  # Normalize to 0-1 range
-                scored_docs.append(result)
+        if not named:
+            if not query_words:
+                return []
+            if len(query_words) == 1:
+                # Single token, no character bonus: the postings are the ranking
+                (word,) = query_words
+                return list(self._postings.get(word, ())[:top_k])
+        
+        # Sparse mat-vec: each query token adds its weight to every document containing it
+        totals = defaultdict(int)
+        for word in query_words:
+            for position, weight in self._postings.get(word, ()):
+                totals[position] += weight
+        
+        # Character name matching (bonus for superhero names)
+        for position in named:
+            totals[position] += 5
+        
+        # (position, score) in document order so ties keep their ranking
+        scores = sorted(totals.items())
         
-        # Sort by score and return top-k
-        scored_docs.sort(key=lambda x: x['similarity'], reverse=True)
-        return scored_docs[:top_k]
+        # Top-k by score (stable, like a reverse sort)
+        return heapq.nlargest(top_k, scores, key=lambda item: item[1])
     
     def generate_answer(self, query: str, top_k: int = 3) -> Dict[str, Any]:
         """Generate an answer using retrieved documents and TinyLlama"""
-        # Get relevant documents
-        retrieved_docs = self.search(query, top_k)
+        # Get relevant documents; result dicts are built once, for the response
+        hits = self._search(query, top_k)
+        retrieved_docs = self._results(hits)
         
         if not self.use_llm or not self.llm:
             # Return simple concatenated results
-            if not retrieved_docs:
+            if not hits:
                 return {
                     "answer": "No relevant information found.",
                     "retrieved_docs": [],
@@ -68,8 +184,9 @@ class SimpleTraditionalRAG:
             
             # Simple concatenation of retrieved content
             answer = "Based on the available information:\n\n"
-            for i, doc in enumerate(retrieved_docs[:3]):
-                answer += f"{i+1}. {doc.get('title', 'Document')}: {doc.get('content', '')}\n"
+            for i, (position, _) in enumerate(hits[:3]):
+                doc = self.documents[position]
+                answer += f"{i+1}. {doc.title}: {doc.content}\n"
             
             return {
                 "answer": answer,
@@ -87,8 +204,12 @@ class SimpleTraditionalRAG:
             }
         except Exception as e:
             # Fallback to simple method
+            if hits:
+                fallback = self.documents[hits[0][0]].content
+            else:
+                fallback = "No information found."
             return {
-                "answer": f"LLM Error: {str(e)}. Fallback: " + retrieved_docs[0].get('content', 'No information available.') if retrieved_docs else "No information found.",
+                "answer": f"LLM Error: {e}. Fallback: {fallback}",
                 "retrieved_docs": retrieved_docs,
                 "method": "traditional_fallback"
             }
@@ -99,7 +220,24 @@ class SimpleGraphRAG:
     def __init__(self, graph_instance=None, use_llm=True):
         self.graph = graph_instance
         self.use_llm = use_llm
-        self.llm = APILLM() if use_llm else None
+        self._llm = _SHARED_LLM
+    
+    @property
+    def llm(self):
+        """Shared API client, created on first use so search-only callers never build one
+        
+        Assigning `rag.llm = client` (e.g. a stub in tests) overrides it for this instance.
+        """
+        if self._llm is not _SHARED_LLM:
+            return self._llm
+        if not self.use_llm:
+            return None
+        from api_llm import get_api_llm
+        return get_api_llm()
+    
+    @llm.setter
+    def llm(self, client):
+        self._llm = client
     
     def search(self, query: str) -> List[Dict[str, Any]]:
         """Search using graph relationships"""
@@ -110,50 +248,45 @@ class SimpleGraphRAG:
         results = []
         
         # Extract hero name if mentioned
-        hero_name = None
-        if 'superman' in query_lower:
-            hero_name = 'Superman'
-        elif 'batman' in query_lower:
-            hero_name = 'Batman'  
-        elif 'wonder woman' in query_lower:
-            hero_name = 'Wonder Woman'
-        elif 'flash' in query_lower:
-            hero_name = 'Flash'
-        
-        if hero_name:
-            # Always get detailed hero information first
-            hero_details = self.graph.query_graph("hero_details", hero_name)
-            results.extend(hero_details)
+        mentioned = set(_HERO_RE.findall(query_lower))
+        hero_name = next((name for key, name in _HERO_PRIORITY if key in mentioned), None)
+        
+        # One session for every sub-query of this search (sessions only connect on first use)
+        with self.graph.driver.session() as session:
+            if hero_name:
+                # Details, teammates and relationships arrive together in one query
+                bundle = self.graph.get_hero_bundle(hero_name, session=session)
+                
+                # Always get detailed hero information first
+                results.extend(bundle["details"])
             
-            # For relationship-specific queries, add connection info
-            if any(word in query_lower for word in ['teammate', 'team', 'ally', 'friend', 'relationship', 'connect', 'related']):
-                # Get teammates
-                teammates = self.graph.query_graph("teammates", hero_name)
-                results.extend(teammates)
+                # For relationship-specific queries, add connection info
+                if _RELATION_RE.search(query_lower):
+                    # Get teammates
+                    results.extend(bundle["teammates"])
                 
-                # Get all relationships
-                relationships = self.graph.query_graph("hero_relationships", hero_name) 
-                results.extend(relationships)
+                    # Get all relationships
+                    results.extend(bundle["relationships"])
             
-            # For basic "who is" questions, also show some connections to demonstrate graph capabilities
-            elif any(word in query_lower for word in ['who', 'what', 'about']):
-                # Add a few key relationships to show the graph advantage
-                teammates = self.graph.query_graph("teammates", hero_name)
-                if teammates:
-                    results.extend(teammates[:2])  # Just show 2 teammates
+                # For basic "who is" questions, also show some connections to demonstrate graph capabilities
+                elif _OVERVIEW_RE.search(query_lower):
+                    # Add a few key relationships to show the graph advantage
+                    teammates = bundle["teammates"]
+                    if teammates:
+                        results.extend(teammates[:2])  # Just show 2 teammates
                     
-            # For power/ability questions, focus on the hero details (already added above)
-            # No additional queries needed
+                # For power/ability questions, focus on the hero details (already added above)
+                # No additional queries needed
         
-        elif 'justice league' in query_lower or 'team member' in query_lower:
-            # Get team members
-            members = self.graph.query_graph("team_members")
-            results.extend(members)
+            elif 'justice league' in query_lower or 'team member' in query_lower:
+                # Get team members
+                members = self.graph.query_graph("team_members", session=session)
+                results.extend(members)
         
-        else:
-            # Default: return all heroes for general queries
-            heroes = self.graph.query_graph("all_heroes")
-            results.extend(heroes)
+            else:
+                # Default: return all heroes for general queries
+                heroes = self.graph.query_graph("all_heroes", session=session)
+                results.extend(heroes)
         
         return results
     
@@ -194,16 +327,17 @@ class SimpleGraphRAG:
             }
         except Exception as e:
             # Fallback to simple method
-            fallback_answer = "LLM Error: " + str(e)
             if retrieved_docs:
-                fallback_answer += f"\n\nFallback: {retrieved_docs[0].get('content', 'No information available.')}"
+                fallback_answer = f"LLM Error: {e}\n\nFallback: {retrieved_docs[0].get('content', 'No information available.')}"
+            else:
+                fallback_answer = f"LLM Error: {e}"
             return {
                 "answer": fallback_answer,
                 "retrieved_docs": retrieved_docs,
                 "method": "graph_fallback"
             }
 
-def create_superhero_documents():
+def create_superhero_documents() -> List[Dict[str, Any]]:
     """Create superhero documents for traditional RAG"""
     documents = [
         {
@@ -240,11 +374,16 @@ def create_superhero_documents():
     
     return documents
 
+@lru_cache(maxsize=1)
+def get_superhero_documents() -> Tuple[Document, ...]:
+    """The superhero documents as Document tuples, built and tokenized once per process (immutable, safe to share)"""
+    return tuple(Document.from_dict(doc) for doc in create_superhero_documents())
+
 if __name__ == "__main__":
     # Test Traditional RAG
     print("🔍 Testing Traditional RAG...")
     traditional_rag = SimpleTraditionalRAG()
-    docs = create_superhero_documents()
+    docs = get_superhero_documents()
     traditional_rag.add_documents(docs)
     
     query = "What are Superman's powers?"
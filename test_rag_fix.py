@@ -8,7 +8,7 @@ import os
 # Add current directory to Python path
 sys.path.append(os.path.dirname(__file__))
 
-from simple_rag import SimpleTraditionalRAG, SimpleGraphRAG, create_superhero_documents
+from simple_rag import SimpleTraditionalRAG, SimpleGraphRAG, get_superhero_documents
 from knowledge_graph import SuperheroGraph
 
 def test_traditional_rag():
@@ -17,7 +17,7 @@ def test_traditional_rag():
     
     # Initialize traditional RAG
     traditional_rag = SimpleTraditionalRAG(use_llm=True)
-    docs = create_superhero_documents()
+    docs = get_superhero_documents()
     traditional_rag.add_documents(docs)
     
     # Test Superman query
@@ -39,7 +39,7 @@ def test_graph_rag():
     try:
         # Initialize graph (may fail if Neo4j not running)
         graph = SuperheroGraph()
-        graph.create_superhero_graph()
+        graph.create_superhero_graph(reset=True)
         
         # Initialize graph RAG
         graph_rag = SimpleGraphRAG(graph, use_llm=True)
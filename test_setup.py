@@ -1,34 +1,31 @@
 """
 Quick test to verify the setup works
 """
+import importlib
+
+# (display name, module) for each required package
+REQUIRED_PACKAGES = (
+    ("Streamlit", "streamlit"),
+    ("Neo4j driver", "neo4j"),
+    ("Pandas", "pandas"),
+)
 
 def test_imports():
     """Test if all required packages can be imported"""
-    try:
-        import streamlit as st
-        print("✅ Streamlit imported")
-    except ImportError as e:
-        print(f"❌ Streamlit import failed: {e}")
-    
-    try:
-        from neo4j import GraphDatabase
-        print("✅ Neo4j driver imported") 
-    except ImportError as e:
-        print(f"❌ Neo4j import failed: {e}")
-    
-    try:
-        import pandas as pd
-        print("✅ Pandas imported")
-    except ImportError as e:
-        print(f"❌ Pandas import failed: {e}")
+    for label, module in REQUIRED_PACKAGES:
+        try:
+            importlib.import_module(module)
+            print(f"✅ {label} imported")
+        except ImportError as e:
+            print(f"❌ {label} import failed: {e}")
 
 def test_traditional_rag():
     """Test Traditional RAG functionality"""
     try:
-        from simple_rag import SimpleTraditionalRAG, create_superhero_documents
+        from simple_rag import SimpleTraditionalRAG, get_superhero_documents
         
         rag = SimpleTraditionalRAG()
-        docs = create_superhero_documents()
+        docs = get_superhero_documents()
         rag.add_documents(docs)
         
         results = rag.search("Superman powers")
@@ -65,12 +65,12 @@ def test_rag_integration():
     print("\n🧪 Testing RAG Integration...")
     
     try:
-        from simple_rag import SimpleTraditionalRAG, create_superhero_documents
+        from simple_rag import SimpleTraditionalRAG, get_superhero_documents
         
         # Test traditional RAG with LLM
         print("📄 Testing Traditional RAG with TinyLlama...")
         trad_rag = SimpleTraditionalRAG(use_llm=True)
-        docs = create_superhero_documents()
+        docs = get_superhero_documents()
         trad_rag.add_documents(docs)
         
         print("✅ Traditional RAG initialized with TinyLlama")